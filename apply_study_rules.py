@@ -9,16 +9,33 @@ Apply the study's inference procedure:
   * If 'yeterli' present without negation/yetersiz -> 'iyi'
   * If 'yetersiz' or 'degil/degildi' -> 'kötü'
   * If 'subopt/kısmen/yer yer/yeryer' -> 'orta'
-- Save predictions to Excel.
+- Save predictions to Excel (or .parquet / .csv, chosen by the output extension).
 """
 import argparse, unicodedata, joblib
+import numpy as np
 import pandas as pd
 from sklearn.metrics import accuracy_score, classification_report
 
+class StripMarks(dict):
+    """
+    str.translate table: NFKD-decompose a character and drop its combining marks.
+    Filled lazily, one entry per distinct character seen.
+    """
+    def __missing__(self, cp):
+        decomposed = unicodedata.normalize('NFKD', chr(cp))
+        self[cp] = ''.join(c for c in decomposed if not unicodedata.combining(c))
+        return self[cp]
+
+STRIP_MARKS = StripMarks()
+
 def normalize(text):
     if not isinstance(text, str):
         return ''
-    return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c)).lower()
+    if text.isascii():
+        return text.lower()
+    # per-character NFKD + mark removal == the whole-string version, since
+    # canonical reordering only moves the combining marks we drop anyway
+    return text.translate(STRIP_MARKS).lower()
 
 def extract_segment(text):
     if not isinstance(text, str):
@@ -37,51 +54,107 @@ def extract_segment(text):
         return norm[idx:end]
     return norm[:100]          # fallback: first 100 chars
 
+# Override keywords, by rule group
+RULE_KEYWORDS = {
+    'adequate': ['yeterli'],
+    'negated':  ['yetersiz', 'degil', 'degildi'],
+    'partial':  ['subopt', 'kismen', 'kısmen', 'yer yer', 'yeryer'],
+}
+
+def classify_with_rules_batch(segments, model_preds):
+    """
+    Applies the rule overrides to model predictions for already-normalized
+    segments: one keyword mask per RULE_KEYWORDS group over all segments,
+    combined with numpy.select in precedence order.
+    """
+    seg = pd.Series(segments, dtype=object)
+    has = {k: seg.str.contains('|'.join(v), regex=True).to_numpy(dtype=bool) for k, v in RULE_KEYWORDS.items()}
+    model_preds = np.asarray(model_preds, dtype=object)
+    conds = [
+        model_preds == 'orta',
+        has['adequate'] & has['negated'],
+        has['adequate'],
+        has['negated'],
+        has['partial'],
+    ]
+    return np.select(conds, ['orta', 'kötü', 'iyi', 'kötü', 'orta'], default=model_preds)
+
 def classify_final(text, model):
     segment = extract_segment(text)
-    norm = segment  # already normalized
-    model_pred = model.predict([segment])[0]  # 'iyi'/'orta'/'kötü'
-    if model_pred == 'orta':
-        return 'orta'
-    if 'yeterli' in norm:
-        if ('degil' in norm) or ('degildi' in norm) or ('yetersiz' in norm):
-            return 'kötü'
-        else:
-            return 'iyi'
-    if ('yetersiz' in norm) or ('degil' in norm) or ('degildi' in norm):
-        return 'kötü'
-    if ('subopt' in norm) or ('kismen' in norm) or ('kısmen' in norm) or ('yer yer' in norm) or ('yeryer' in norm):
-        return 'orta'
-    return model_pred
+    model_pred = model.predict([segment])  # 'iyi'/'orta'/'kötü'
+    return classify_with_rules_batch([segment], model_pred)[0]
+
+def classify_series(texts, model):
+    """
+    Batch version of classify_final: segments every distinct report text,
+    predicts each distinct segment once in a single model.predict call and
+    maps the labels back.
+    """
+    texts = texts.fillna('')
+    if texts.empty:
+        return texts.astype(object)
+    unique = texts.unique()
+    segments = [extract_segment(t) for t in unique]
+    # many reports share the same cleanliness sentence: score each one once. The
+    # final label depends only on the segment, so the rules run per segment too.
+    unique_segs, inverse = np.unique(np.array(segments, dtype=object), return_inverse=True)
+    labels = classify_with_rules_batch(unique_segs, model.predict(unique_segs))[inverse]
+    return texts.map(dict(zip(unique, labels)))
+
+def excel_engine():
+    """
+    python-calamine (pandas >= 2.2) reads .xlsx much faster and with less memory
+    than openpyxl; fall back to openpyxl when it is not available.
+    """
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return 'openpyxl'
+    major, minor = (int(x) for x in pd.__version__.split('.')[:2])
+    return 'calamine' if (major, minor) >= (2, 2) else 'openpyxl'
+
+def save_table(df, path):
+    # .parquet (pyarrow) and .csv write far faster and smaller than .xlsx; Excel stays the default
+    if path.lower().endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    elif path.lower().endswith('.csv'):
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False, engine='openpyxl')
 
 def main(args):
     model = joblib.load(args.model)
 
     # Optional: evaluate on TRAIN (consistency check)
     if args.train and args.train_text_col and args.train_label_col:
-        train_df = pd.read_excel(args.train, engine='openpyxl').dropna(subset=[args.train_text_col, args.train_label_col])
+        # same reader as train_study_model.py so the evaluated rows match the training rows;
+        # the text column stays untyped so non-text cells keep classifying as empty segments
+        train_df = pd.read_excel(args.train, engine='openpyxl', usecols=[args.train_text_col, args.train_label_col],
+                                 dtype={args.train_label_col: 'string'}).dropna(subset=[args.train_text_col, args.train_label_col])
         y_true = train_df[args.train_label_col].astype(str).str.strip().str.lower()
-        y_pred = train_df[args.train_text_col].apply(lambda t: classify_final(t, model))
+        y_pred = classify_series(train_df[args.train_text_col], model)
         print('=== Evaluation on TRAIN (study-style) ===')
         print('Accuracy:', accuracy_score(y_true, y_pred))
         print(classification_report(y_true, y_pred, digits=2))
 
     # Apply to full cohort
-    full_df = pd.read_excel(args.predict, engine='openpyxl')
+    # every column is kept (the output is the full cohort plus the prediction); calamine's
+    # reading of whitespace-only cells as empty does not change their (empty) segment
+    full_df = pd.read_excel(args.predict, engine=excel_engine())
     assert args.full_text_col in full_df.columns, f'Text column not found: {args.full_text_col}'
-    full_df['temizlik sinifi tahmin'] = full_df[args.full_text_col].apply(lambda t: classify_final(t, model))
+    full_df['temizlik sinifi tahmin'] = classify_series(full_df[args.full_text_col], model)
 
     print('\n=== Distribution on FULL (study-style) ===')
     print(full_df['temizlik sinifi tahmin'].value_counts(dropna=False))
 
-    full_df.to_excel(args.output, index=False)
+    save_table(full_df, args.output)
     print('\nSaved:', args.output)
 
 if __name__ == '__main__':
     p = argparse.ArgumentParser()
     p.add_argument('--model',          required=True)  # e.g. C:\...\colon_cleanliness_model.pkl
     p.add_argument('--predict',        required=True)  # e.g. C:\...\tum_hastalar_with_bulgular_v2.xlsx
-    p.add_argument('--output',         required=True)  # e.g. C:\...\adr.v3.xlsx
+    p.add_argument('--output',         required=True)  # e.g. C:\...\adr.v3.xlsx (.parquet / .csv also accepted)
     p.add_argument('--full-text-col',  default='BULGULAR')
     # optional evaluation on TRAIN
     p.add_argument('--train',          default=None)   # e.g. C:\...\ADR.v2.xlsx
@@ -23,133 +23,145 @@ Usage:
 Notes:
 - Patterns are bilingual (TR + EN) and robust to common spelling variants.
 - This is a deterministic heuristic layer intended to complement supervised ML classification.
+- The extract_* helpers take text already passed through normalize_text; use
+  extract_report() for a single raw report and apply_rules_to_series() for a column.
 """
 
 import re
 import argparse
-from typing import List, Optional, Tuple, Dict
+from typing import List, Optional, Pattern, Set, Tuple, Dict
 import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
 
 # -------------------- Normalization --------------------
 
+WS_PAT = re.compile(r"\s+")
+# Turkish diacritics -> ASCII, applied in a single str.translate pass
+TR_TABLE = str.maketrans("ışğüöçİŞĞÜÖÇ", "isguocisguoc")
+
 def normalize_text(s: str) -> str:
     if not isinstance(s, str):
         return ""
-    s = s.lower()
+    s = s.lower().translate(TR_TABLE)
     # Normalize common punctuation variants
-    s = re.sub(r"\s+", " ", s)
-    s = s.replace("ı", "i").replace("İ", "i")
-    s = s.replace("ş", "s").replace("Ş", "s")
-    s = s.replace("ğ", "g").replace("Ğ", "g")
-    s = s.replace("ü", "u").replace("Ü", "u")
-    s = s.replace("ö", "o").replace("Ö", "o")
-    s = s.replace("ç", "c").replace("Ç", "c")
+    s = WS_PAT.sub(" ", s)
     return s.strip()
 
+# -------------------- Pattern unions --------------------
+
+def union_patterns(patterns: List[str]) -> Pattern[str]:
+    """
+    Compiles a group of alternative patterns into one regex, so a single
+    search answers "does any of them match".
+    """
+    return re.compile("|".join(f"(?:{p})" for p in patterns))
+
+def named_union(groups: Dict[str, List[str]]) -> Tuple[Pattern[str], Dict[str, str]]:
+    """
+    Compiles {key: patterns} into one alternation with a named group per key.
+    Returns the regex and a {group name: key} map (keys need not be identifiers).
+    """
+    names = {re.sub(r"\W", "_", k): k for k in groups}
+    pat = re.compile("|".join(f"(?P<{n}>{'|'.join(groups[k])})" for n, k in names.items()))
+    return pat, names
+
+def group_hits(pat: Pattern[str], names: Dict[str, str], t: str) -> Set[str]:
+    return {names[m.lastgroup] for m in pat.finditer(t)}
+
 # -------------------- Cecal / Ileal intubation --------------------
-CECAL_POS = [
-    r"cekuma (ulasildi|ilerlenildi|gelindi|girildi)",
+CECAL_POS_RE = union_patterns([
+    r"cekuma (?:ulasildi|ilerlenildi|gelindi|girildi)",
     r"cekuma kadar ilerlen",
-    r"cecum (reached|intubated)",
+    r"cecum (?:reached|intubated)",
     r"ti c|ti-c|ti-c?i? completed",  # common shorthand noise
-    r"cecal intubation (achieved|successful)",
-]
-CECAL_NEG = [
-    r"cekuma (ulasilamadi|gidilemedi|ilerlenemedi)",
-    r"cec(um|al) (not reached|not intubated|could not be reached)",
-]
-
-ILEAL_POS = [
-    r"terminal ileum (lumen|mukoza)?(si)? normal(di)?",
-    r"ileuma (ulasildi|girildi|ilerlenildi)",
-    r"ileal (intubation|exam(in(ed|ation))? completed)",
-    r"ti (gorus|mukoza|lumen)",
-]
-ILEAL_NEG = [
-    r"ileuma (ulasilamadi|girilemedi|ilerlenemedi)",
-    r"ileal intubation (not achieved|failed|unsuccessful)",
-]
-
-def any_match(patterns: List[str], txt: str) -> bool:
-    return any(re.search(p, txt) for p in patterns)
-
-def extract_cecal_ileal(txt: str) -> Tuple[Optional[int], Optional[int]]:
-    t = normalize_text(txt)
+    r"cecal intubation (?:achieved|successful)",
+])
+CECAL_NEG_RE = union_patterns([
+    r"cekuma (?:ulasilamadi|gidilemedi|ilerlenemedi)",
+    r"cec(?:um|al) (?:not reached|not intubated|could not be reached)",
+])
+
+ILEAL_POS_RE = union_patterns([
+    r"terminal ileum (?:lumen|mukoza)?(?:si)? normal(?:di)?",
+    r"ileuma (?:ulasildi|girildi|ilerlenildi)",
+    r"ileal (?:intubation|exam(?:in(?:ed|ation))? completed)",
+    r"ti (?:gorus|mukoza|lumen)",
+])
+ILEAL_NEG_RE = union_patterns([
+    r"ileuma (?:ulasilamadi|girilemedi|ilerlenemedi)",
+    r"ileal intubation (?:not achieved|failed|unsuccessful)",
+])
+
+def extract_cecal_ileal(t: str) -> Tuple[Optional[int], Optional[int]]:
     cecal = None
     ileal = None
-    if any_match(CECAL_POS, t):
+    if CECAL_POS_RE.search(t):
         cecal = 1
-    if any_match(CECAL_NEG, t):
+    if CECAL_NEG_RE.search(t):
         cecal = 0
-    if any_match(ILEAL_POS, t):
+    if ILEAL_POS_RE.search(t):
         ileal = 1
-    if any_match(ILEAL_NEG, t):
+    if ILEAL_NEG_RE.search(t):
         ileal = 0
     return cecal, ileal
 
 # -------------------- Polyp presence / count / size --------------------
 
-POLYP_POS = [
+POLYP_POS_RE = union_patterns([
     r"\bpolip\b",
     r"polipo?id",
     r"adenom",
-    r"lesyon (goruldu|mevcut|izlendi|saptandi)",
+    r"lesyon (?:goruldu|mevcut|izlendi|saptandi)",
     r"polyp|adenoma",
-]
-POLYP_NEG_HINTS = [
-    r"polip (gorulmedi|saptanmadi|izlenmedi|yok)",
-    r"no (polyp|adenoma)",
-]
+])
+POLYP_NEG_HINTS_RE = union_patterns([
+    r"polip (?:gorulmedi|saptanmadi|izlenmedi|yok)",
+    r"no (?:polyp|adenoma)",
+])
 
-SIZE_PAT = r"(?:(\d+(?:\.\d+)?)\s*[-xX×]?\s*(\d+(?:\.\d+)?)?\s*mm)"
+SIZE_PAT = re.compile(r"(?:(\d+(?:\.\d+)?)\s*[-xX×]?\s*(\d+(?:\.\d+)?)?\s*mm)")
 # captures 10 mm OR 10x8 mm etc.
 
-def extract_polyp_presence(txt: str) -> int:
-    t = normalize_text(txt)
-    if any_match(POLYP_NEG_HINTS, t):
+# explicit count patterns
+# e.g., "3 adet polip", "iki polip", "multiple polyps"
+DIGIT_PAT = re.compile(r"(\d+)\s*(?:adet)?\s*polip")
+WORDNUM = {
+    "bir":1,"iki":2,"uc":3,"dort":4,"bes":5,"alti":6,"yedi":7,"sekiz":8,"dokuz":9,
+    "one":1,"two":2,"three":3,"four":4,"five":5,"six":6,"seven":7,"eight":8,"nine":9,
+    "multiple":3,"coklu":3
+}
+WORDNUM_PATS = {re.compile(rf"\b{w}\b\s*(?:adet)?\s*polip"): v for w, v in WORDNUM.items()}
+
+def extract_polyp_presence(t: str) -> int:
+    if POLYP_NEG_HINTS_RE.search(t):
         return 0
-    return 1 if any_match(POLYP_POS, t) else 0
+    return 1 if POLYP_POS_RE.search(t) else 0
 
-def extract_polyp_count(txt: str) -> Optional[int]:
-    t = normalize_text(txt)
-    # explicit count patterns
-    # e.g., "3 adet polip", "iki polip", "multiple polyps"
-    DIGIT_PAT = r"(\d+)\s*(adet)?\s*polip"
-    WORDNUM = {
-        "bir":1,"iki":2,"uc":3,"dort":4,"bes":5,"alti":6,"yedi":7,"sekiz":8,"dokuz":9,
-        "one":1,"two":2,"three":3,"four":4,"five":5,"six":6,"seven":7,"eight":8,"nine":9,
-        "multiple":3,"coklu":3
-    }
-    m = re.search(DIGIT_PAT, t)
+def extract_polyp_count(t: str, presence: Optional[int] = None) -> Optional[int]:
+    """
+    `presence` is extract_polyp_presence(t) if the caller already has it.
+    """
+    m = DIGIT_PAT.search(t)
     if m:
         try:
             return int(m.group(1))
         except:
             pass
-    for w, v in WORDNUM.items():
-        if re.search(rf"\b{w}\b\s*(adet)?\s*polip", t):
+    for pat, v in WORDNUM_PATS.items():
+        if pat.search(t):
             return v
     # fallback: if mentions polyp but no count, return 1
-    return 1 if extract_polyp_presence(t) == 1 else None
+    if presence is None:
+        presence = extract_polyp_presence(t)
+    return 1 if presence == 1 else None
 
-def extract_size_info(txt: str) -> Tuple[Optional[float], Optional[str]]:
+def extract_size_info(t: str) -> Tuple[Optional[float], Optional[str]]:
     """
     Finds the largest mm value mentioned and returns bucket.
     """
-    t = normalize_text(txt)
-    sizes = []
-    for m in re.finditer(SIZE_PAT, t):
-        a = m.group(1)
-        b = m.group(2)
-        nums = []
-        if a:
-            try: nums.append(float(a))
-            except: pass
-        if b:
-            try: nums.append(float(b))
-            except: pass
-        if nums:
-            sizes.append(max(nums))
+    # findall yields (a, b) string pairs; b is "" for single sizes. Both groups are
+    # plain decimals, so float() cannot fail.
+    sizes = [float(x) for pair in SIZE_PAT.findall(t) for x in pair if x]
     if not sizes:
         return None, None
     mx = max(sizes)
@@ -164,31 +176,27 @@ def extract_size_info(txt: str) -> Tuple[Optional[float], Optional[str]]:
 # -------------------- Locations --------------------
 
 LOC_PATTERNS: Dict[str, List[str]] = {
-    "cecum": [r"cek(um|um)?\b", r"\bcecum\b"],
-    "right": [r"\bsag\b", r"\bright (colon)?\b"],
+    "cecum": [r"cek(?:um)?\b", r"\bcecum\b"],
+    "right": [r"\bsag\b", r"\bright (?:colon)?\b"],
     "transverse": [r"\btransvers\b", r"\btransverse\b"],
-    "left": [r"\bsol\b", r"\bleft (colon)?\b"],
+    "left": [r"\bsol\b", r"\bleft (?:colon)?\b"],
     "sigmoid": [r"\bsigmoid\b"],
     "rectum": [r"\brektum\b", r"\brectum\b"],
     "rectosigmoid": [r"rektosigmoid", r"rectosigmoid"],
-    "ileum": [r"\bileum\b", r"\bileum?\b"],
+    "ileum": [r"\bileum\b"],
     "multifocal": [r"multifokal|multiple sites|diffuse"],
 }
+LOC_RE, LOC_GROUPS = named_union(LOC_PATTERNS)
 
-def extract_locations(txt: str) -> str:
-    t = normalize_text(txt)
-    hits = []
-    for loc, pats in LOC_PATTERNS.items():
-        if any(re.search(p, t) for p in pats):
-            hits.append(loc)
-    # de-duplicate and stable order
-    order = ["cecum","right","transverse","left","sigmoid","rectum","rectosigmoid","ileum","multifocal"]
-    hits_sorted = [h for h in order if h in hits]
+def extract_locations(t: str) -> str:
+    hits = group_hits(LOC_RE, LOC_GROUPS, t)
+    # stable order, as listed in LOC_PATTERNS
+    hits_sorted = [h for h in LOC_PATTERNS if h in hits]
     return "|".join(hits_sorted) if hits_sorted else ""
 
 # -------------------- Polypectomy method --------------------
 
-POLYPECTOMY_MAP = {
+POLYPECTOMY_MAP: Dict[str, List[str]] = {
     "biopsy forceps": [r"biyopsi pensi", r"biopsy forceps"],
     "cold snare": [r"soguk snare", r"cold snare"],
     "hot snare": [r"sicak snare", r"hot snare"],
@@ -196,82 +204,119 @@ POLYPECTOMY_MAP = {
     "ESD": [r"\besd\b", r"submukozal diseksiyon"],
     "not removed": [r"cikartilmadi|eksizyon yapilmadi|remove edilmedi|not removed"],
 }
-
-def extract_polypectomy_method(txt: str) -> str:
-    t = normalize_text(txt)
-    for k, pats in POLYPECTOMY_MAP.items():
-        if any(re.search(p, t) for p in pats):
+POLYPECTOMY_RE, POLYPECTOMY_GROUPS = named_union(POLYPECTOMY_MAP)
+SNARE_PAT = re.compile(r"snare")
+# substring hints for the snare/forceps fallback
+COLD_HINT = re.compile(r"cold|soguk")
+HOT_HINT = re.compile(r"hot|sicak|cauter")
+FORCEPS_HINT = re.compile(r"forceps|pensi")
+
+def extract_polypectomy_method(t: str) -> str:
+    hits = group_hits(POLYPECTOMY_RE, POLYPECTOMY_GROUPS, t)
+    for k in POLYPECTOMY_MAP:
+        if k in hits:
             return k
     # infer from cautery/clip context if possible
-    if re.search(r"snare", t):
+    if SNARE_PAT.search(t):
         # default to unspecified snare -> cold snare if 'cold' present else hot if 'cautery' present
-        if "cold" in t or "soguk" in t:
+        if COLD_HINT.search(t):
             return "cold snare"
-        if "hot" in t or "sicak" in t or "cauter" in t:
+        if HOT_HINT.search(t):
             return "hot snare"
         return "unknown"
-    if "forceps" in t or "pensi" in t:
+    if FORCEPS_HINT.search(t):
         return "biopsy forceps"
     return "unknown"
 
 # -------------------- Bleeding / Hemoclip --------------------
 
-def extract_bleeding(txt: str) -> Optional[int]:
+BLEEDING_NEG = re.compile(r"kanama (?:yok|izlenmedi|saptanmadi)|no bleeding")
+BLEEDING_POS = re.compile(r"(?:aktif )?kanama (?:mevcut|izlendi|saptandi)|active bleeding|spurting|oozing")
+BLEEDING_SUSPECTED = re.compile(r"kanama supheli|suspected bleeding")
+HEMOCLIP_POS = re.compile(r"hemoklip|hemoclip|clip uygul")
+HEMOCLIP_NEG = re.compile(r"klip uygulanmadi|no clip")
+
+def extract_bleeding(t: str) -> Optional[int]:
     """
     0=no, 1=suspected, 2=present
     """
-    t = normalize_text(txt)
-    if re.search(r"kanama (yok|izlenmedi|saptanmadi)|no bleeding", t):
+    if BLEEDING_NEG.search(t):
         return 0
-    if re.search(r"(aktif )?kanama (mevcut|izlendi|saptandi)|active bleeding|spurting|oozing", t):
+    if BLEEDING_POS.search(t):
         return 2
-    if re.search(r"kanama supheli|suspected bleeding", t):
+    if BLEEDING_SUSPECTED.search(t):
         return 1
     return None
 
-def extract_hemoclip(txt: str) -> Optional[int]:
-    t = normalize_text(txt)
-    if re.search(r"hemoklip|hemoclip|clip uygul", t):
+def extract_hemoclip(t: str) -> Optional[int]:
+    if HEMOCLIP_POS.search(t):
         return 1
-    if re.search(r"klip uygulanmadi|no clip", t):
+    if HEMOCLIP_NEG.search(t):
         return 0
     return None
 
 # -------------------- Main apply --------------------
 
-def apply_rules_to_series(s: pd.Series) -> pd.DataFrame:
-    out = dict(
-        cecal_intubation=[],
-        ileal_intubation=[],
-        polyp_present=[],
-        polyp_count=[],
-        largest_polyp_size_mm=[],
-        largest_polyp_size_bucket=[],
-        polyp_locations=[],
-        polypectomy_method=[],
-        post_polypectomy_bleeding=[],
-        hemoclip_applied=[],
+def extract_report(txt: str) -> Dict[str, object]:
+    """
+    All variables for one raw report, normalizing it once for every extractor.
+    """
+    t = normalize_text(txt)
+    cecal, ileal = extract_cecal_ileal(t)
+    present = extract_polyp_presence(t)
+    size_mm, bucket = extract_size_info(t)
+    return dict(
+        cecal_intubation=cecal,
+        ileal_intubation=ileal,
+        polyp_present=present,
+        polyp_count=extract_polyp_count(t, presence=present),
+        largest_polyp_size_mm=size_mm,
+        largest_polyp_size_bucket=bucket,
+        polyp_locations=extract_locations(t),
+        polypectomy_method=extract_polypectomy_method(t),
+        post_polypectomy_bleeding=extract_bleeding(t),
+        hemoclip_applied=extract_hemoclip(t),
     )
-    for txt in s.fillna("").astype(str).tolist():
-        cecal, ileal = extract_cecal_ileal(txt)
-        out["cecal_intubation"].append(cecal)
-        out["ileal_intubation"].append(ileal)
-        out["polyp_present"].append(extract_polyp_presence(txt))
-        out["polyp_count"].append(extract_polyp_count(txt))
-        size_mm, bucket = extract_size_info(txt)
-        out["largest_polyp_size_mm"].append(size_mm)
-        out["largest_polyp_size_bucket"].append(bucket)
-        out["polyp_locations"].append(extract_locations(txt))
-        out["polypectomy_method"].append(extract_polypectomy_method(txt))
-        out["post_polypectomy_bleeding"].append(extract_bleeding(txt))
-        out["hemoclip_applied"].append(extract_hemoclip(txt))
-    return pd.DataFrame(out)
+
+# nullable integer outputs of extract_report
+INT_COLUMNS = ["cecal_intubation", "ileal_intubation", "polyp_count",
+               "post_polypectomy_bleeding", "hemoclip_applied"]
+
+def int_column(values: List[Optional[int]]) -> pd.Series:
+    # exact ints as Int64 (<NA> for None); object if a value does not fit int64
+    try:
+        return pd.Series(values, dtype="Int64")
+    except (TypeError, OverflowError):
+        return pd.Series(values, dtype=object)
+
+def apply_rules_to_chunk(s: pd.Series) -> pd.DataFrame:
+    rows = [extract_report(txt) for txt in s]
+    columns = list(extract_report(""))
+    out = pd.DataFrame(rows, columns=columns)
+    for c in INT_COLUMNS:
+        out[c] = int_column([r[c] for r in rows])
+    return out
+
+def apply_rules_to_series(s: pd.Series, n_jobs: int = 1) -> pd.DataFrame:
+    """
+    Extracts all variables for a column of raw reports. With n_jobs != 1 the
+    column is split into chunks processed in parallel worker processes
+    (joblib, loky backend); -1 uses all cores.
+    """
+    if n_jobs == 1 or len(s) == 0:
+        return apply_rules_to_chunk(s)
+    n_chunks = effective_n_jobs(n_jobs) * 4
+    size = -(-len(s) // n_chunks)
+    chunks = [s.iloc[i:i + size] for i in range(0, len(s), size)]
+    frames = Parallel(n_jobs=n_jobs, backend="loky")(delayed(apply_rules_to_chunk)(c) for c in chunks)
+    return pd.concat(frames, ignore_index=True)
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--input", required=True, help="Path to .xlsx or .csv file containing reports")
     ap.add_argument("--text-col", default="BULGULAR", help="Name of the text column with colonoscopy findings")
-    ap.add_argument("--out", required=True, help="Path to output .csv")
+    ap.add_argument("--out", required=True, help="Path to output .csv (or .parquet)")
+    ap.add_argument("--n-jobs", type=int, default=1, help="Worker processes for rule extraction (-1 = all cores)")
     args = ap.parse_args()
 
     # Load
@@ -283,9 +328,12 @@ def main():
     if args.text_col not in df.columns:
         raise SystemExit(f"Text column '{args.text_col}' not found. Available: {list(df.columns)}")
 
-    features = apply_rules_to_series(df[args.text_col])
+    features = apply_rules_to_series(df[args.text_col], n_jobs=args.n_jobs)
     out_df = pd.concat([df, features], axis=1)
-    out_df.to_csv(args.out, index=False)
+    if args.out.lower().endswith(".parquet"):
+        out_df.to_parquet(args.out, index=False)
+    else:
+        out_df.to_csv(args.out, index=False)
     print(f"Saved extracted features to: {args.out}")
     # quick prevalence print
     print(out_df[["cecal_intubation","ileal_intubation","polyp_present"]].describe(include='all'))
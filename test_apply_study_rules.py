@@ -0,0 +1,122 @@
+"""
+apply_study_rules.normalize must match train_study_model.normalize, which the
+model was trained on, and classify_series must give the same labels as
+classify_final report by report.
+"""
+
+import itertools
+import sys
+
+import numpy as np
+import pandas as pd
+
+import apply_study_rules
+import train_study_model
+
+TEXTS = [
+    "Kolon temizliği İYİ, çekuma ulaşıldı.",
+    "İstanbul ŞIŞLI ĞÜÖÇ ışğüöç",
+    "ﬁnal ﬀ ㎜ ½ Ⅻ",  # compatibility decompositions
+    "e\u0301 a\u0323\u0301 a\u0301\u0323 \u022b",  # marks in and out of canonical order
+    "\u0301leading mark",
+    "한국어 日本語 Ελληνικά ёж",
+    "plain ascii text.",
+    "",
+]
+
+
+def test_normalize_matches_training():
+    for text in TEXTS:
+        assert apply_study_rules.normalize(text) == train_study_model.normalize(text)
+
+
+def test_normalize_matches_training_on_every_code_point():
+    chars = "".join(chr(c) for c in range(0x80, sys.maxunicode + 1) if not 0xD800 <= c < 0xE000)
+    assert apply_study_rules.normalize(chars) == train_study_model.normalize(chars)
+
+
+class StubModel:
+    """
+    Deterministic stand-in for the trained pipeline: the label is read from a
+    marker in the segment, so every model label can be combined with every
+    override keyword. Counts the segments it is asked to score.
+    """
+    def __init__(self):
+        self.scored = 0
+
+    def predict(self, segments):
+        self.scored += len(segments)
+        return np.array(['orta' if 'm-orta' in s else 'kötü' if 'm-kotu' in s else 'iyi'
+                         for s in segments], dtype=object)
+
+
+def study_rules(norm, model_pred):
+    # the override rules exactly as first written in classify_final
+    if model_pred == 'orta':
+        return 'orta'
+    if 'yeterli' in norm:
+        if ('degil' in norm) or ('degildi' in norm) or ('yetersiz' in norm):
+            return 'kötü'
+        else:
+            return 'iyi'
+    if ('yetersiz' in norm) or ('degil' in norm) or ('degildi' in norm):
+        return 'kötü'
+    if ('subopt' in norm) or ('kismen' in norm) or ('kısmen' in norm) or ('yer yer' in norm) or ('yeryer' in norm):
+        return 'orta'
+    return model_pred
+
+
+KEYWORDS = ['yeterli', 'yetersiz', 'degil', 'degildi', 'subopt', 'kısmen', 'yer yer', 'yeryer']
+MARKERS = ['m-iyi', 'm-orta', 'm-kotu']
+RULE_REPORTS = [
+    f"Kolon temizliği {marker} {' '.join(kw)}. Çekuma ulaşıldı."
+    for marker in MARKERS
+    for n in range(3)
+    for kw in itertools.combinations(KEYWORDS, n)
+]
+
+
+def test_classify_final_follows_study_rules():
+    model = StubModel()
+    for text in RULE_REPORTS:
+        segment = apply_study_rules.extract_segment(text)
+        expected = study_rules(segment, model.predict([segment])[0])
+        assert apply_study_rules.classify_final(text, model) == expected
+
+
+def test_extract_segment():
+    extract = apply_study_rules.extract_segment
+    assert extract(None) == ''
+    assert extract(12.5) == ''
+    # up to the next '.', from the highest-priority anchor present
+    assert extract('Hazırlık: kolon temizlik skoru 2. Kolon temizliği iyi. Son.') == 'kolon temizligi iyi'
+    assert extract('KOLON TEMİZLİĞİ YETERLİ.') == 'kolon temizligi yeterli'
+    assert extract('kolon temizliksiz x. kolon temizlig y.') == 'kolon temizlig y'
+    # no '.' after the anchor: 100-character window
+    assert extract('ön ' + 'kolon temizlik ' + 'x' * 200) == ('kolon temizlik ' + 'x' * 200)[:100]
+    # no anchor: first 100 characters
+    assert extract('Ç' * 150) == 'c' * 100
+
+
+def test_classify_series_matches_per_report():
+    reports = RULE_REPORTS + [
+        None, np.nan, 42, 3.5, '', '   ',
+        'Kolon temizlik skoru düşük. Kolon temizliği yetersiz.',
+        'kolon temizlik: kısmen, kolon temizlig iyi. kolon temizligi m-orta.',
+        'Kolon temizliginde yer yer gaita',
+        'Çekuma ulaşıldı, polip yok.',
+    ]
+    reports = reports + reports[::3]  # repeated texts and segments
+    texts = pd.Series(reports, index=[f'r{i}' for i in range(len(reports))][::-1], dtype=object)
+    model = StubModel()
+    out = apply_study_rules.classify_series(texts, model)
+    assert out.index.equals(texts.index)
+    assert out.tolist() == [apply_study_rules.classify_final(t, StubModel()) for t in reports]
+    # each distinct segment is scored once
+    assert model.scored == len({apply_study_rules.extract_segment(t) for t in reports})
+
+
+def test_classify_series_empty():
+    texts = pd.Series([], index=pd.Index([], dtype='int64'), dtype=object)
+    out = apply_study_rules.classify_series(texts, StubModel())
+    assert out.empty and out.index.equals(texts.index)
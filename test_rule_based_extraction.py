@@ -0,0 +1,58 @@
+"""
+apply_rules_to_series must give the same answers as extract_report row by
+row, serially and in worker processes.
+"""
+
+import pandas as pd
+
+from rule_based_extraction import apply_rules_to_series, extract_report
+
+REPORTS = [
+    "Çekuma ulaşıldı. Terminal ileum normal. Polip görülmedi.",
+    "Cekuma ulasilamadi, ileuma girilemedi.",
+    "Cecum reached. Ileal intubation failed. No polyp.",
+    "Sigmoid kolonda 3 adet polip, en büyüğü 12x8 mm, sıcak snare ile çıkarıldı.",
+    "Rektumda iki polip (4 mm ve 6 mm), soğuk snare ile polipektomi. Hemoklip uygulandı.",
+    "Transvers kolonda 15 mm polip, EMR yapıldı. Aktif kanama izlendi.",
+    "Sağ kolonda lezyon saptandı, ESD planlandı. Kanama şüpheli.",
+    "Multiple polyps in left colon, removed with cold snare. No bleeding, no clip.",
+    "Rektosigmoid bileşkede polipoid lezyon, biyopsi pensi ile biyopsi alındı.",
+    "Çekumda 7 mm adenom, snare ile çıkarıldı.",
+    "Polip var, forceps ile alındı.",
+    "Multifokal diffuse polipler, çıkartılmadı.",
+    "",
+    None,
+    "   ",
+    # Unicode digits: \d matches them and int() accepts them
+    "٣ adet polip",
+    "１２ polip, ٥ mm",
+    # counts beyond float precision and beyond int64
+    "12345678901234567 polip",
+    "11111111111111111111 adet polip",
+    # \b next to a non-ASCII letter: no word boundary under Python's re
+    "polipé",
+    "sagé kolon",
+    "esdé",
+]
+
+
+def as_records(df: pd.DataFrame) -> list:
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def test_series_matches_per_report():
+    expected = [extract_report(x) for x in REPORTS]
+    assert as_records(apply_rules_to_series(pd.Series(REPORTS))) == expected
+
+
+def test_parallel_matches_serial():
+    s = pd.Series(REPORTS * 3)
+    assert as_records(apply_rules_to_series(s, n_jobs=2)) == as_records(apply_rules_to_series(s))
+
+
+def test_word_boundary_is_unicode_aware():
+    # engines with ASCII-only \b (RE2, Arrow) would match all three
+    out = apply_rules_to_series(pd.Series(["polipé", "sagé kolon", "esdé"]))
+    assert out["polyp_present"].tolist() == [0, 0, 0]
+    assert out["polyp_locations"].tolist() == ["", "", ""]
+    assert out["polypectomy_method"].tolist() == ["unknown"] * 3